@@ -1,17 +1,78 @@
+import asyncio
+import hashlib
+import heapq
 import json
 import os
 import sys
 import time
-import urllib.error
-import urllib.request
 from datetime import datetime, timezone
+from typing import Any
+
+import httpx
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# HTTP/2 multiplexes all GraphQL requests over one TLS connection; httpx
+# only enables it when the h2 package is installed.
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# orjson is a C-accelerated JSON codec; fall back to stdlib json with a
+# bytes-producing dumps so call sites are identical either way.
+try:
+    import orjson
+
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+# GraphQL responses compress extremely well (repetitive field names).
+# httpx decompresses transparently; advertise brotli only when its
+# decoder is importable so the server never sends an encoding we cannot
+# decode.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPT_ENCODING = "br, gzip, deflate" if brotli is not None else "gzip, deflate"
+
+# Compressed on-disk response cache; zstandard when installed, stdlib
+# gzip otherwise (different extensions so the two never mix).
+try:
+    import zstandard
+
+    _CACHE_EXT = ".json.zst"
+    _compress = zstandard.ZstdCompressor().compress
+
+    def _decompress(blob: bytes) -> bytes:
+        return zstandard.ZstdDecompressor().decompress(blob)
+except ImportError:
+    import gzip
+
+    _CACHE_EXT = ".json.gz"
+    _compress = gzip.compress
+    _decompress = gzip.decompress
 
 GRAPHQL = "https://api.morpho.org/graphql"
 
+# (chain_id, lowercased vault address) -> (exposure addresses, unknown)
+ExposureKey = tuple[int, str]
+ExposureResult = tuple[frozenset[str], bool]
+
 VAULTS_QUERY = """
 query VaultV2s($chainIds: [Int!], $first: Int!, $skip: Int!) {
   vaultV2s(
-    where: { chainId_in: $chainIds }
+    where: { chainId_in: $chainIds, whitelisted: true }
     first: $first
     skip: $skip
     orderBy: TotalAssetsUsd
@@ -21,15 +82,14 @@ query VaultV2s($chainIds: [Int!], $first: Int!, $skip: Int!) {
       address
       name
       symbol
-      chain { id network }
-      asset { address symbol decimals }
+      chain { id }
+      asset { address decimals }
       totalAssets
       totalAssetsUsd
       netApy
       whitelisted
-      warnings { type level }
+      warnings { __typename }
     }
-    pageInfo { countTotal count skip limit }
   }
 }
 """
@@ -40,19 +100,18 @@ query VaultV2Exposure($address: String!, $chainId: Int!, $positionsFirst: Int!)
     adapters {
       items {
         __typename
-        type
         ... on MetaMorphoAdapter {
           metaMorpho {
             address
-            asset { address symbol }
+            asset { address }
           }
         }
         ... on MorphoMarketV1Adapter {
           positions(first: $positionsFirst) {
             items {
               market {
-                loanAsset { address symbol }
-                collateralAsset { address symbol }
+                loanAsset { address }
+                collateralAsset { address }
               }
             }
           }
@@ -63,11 +122,33 @@ query VaultV2Exposure($address: String!, $chainId: Int!, $positionsFirst: Int!)
 }
 """
 
+# Pre-encoded payload templates: the (large, constant) query text is
+# JSON-escaped once at module load, so per-request encoding only covers
+# the small variables dict.
+PAYLOAD_PREFIX = {
+    query: b'{"query":' + _dumps(query) + b',"variables":'
+    for query in (VAULTS_QUERY, EXPOSURE_QUERY)
+}
+
+
+def _encode_operation(query: str, variables: dict[str, Any]) -> bytes:
+    prefix = PAYLOAD_PREFIX.get(query)
+    if prefix is not None:
+        return prefix + _dumps(variables) + b"}"
+    return _dumps({"query": query, "variables": variables})
+
+
 CHAIN_MAP = {
-    "ethereum": [1],
-    "base": [8453],
-    "arbitrum": [42161],
-    "all": [1, 8453, 42161],
+    "ethereum": (1,),
+    "base": (8453,),
+    "arbitrum": (42161,),
+    "all": (1, 8453, 42161),
+}
+
+NETWORK_BY_ID = {
+    1: "ethereum",
+    8453: "base",
+    42161: "arbitrum",
 }
 
 ALLOWLIST = {
@@ -104,14 +185,42 @@ ALLOWLIST = {
     },
 }
 
-DEPOSIT_ALLOW = {"USDC", "USDT", "ETH", "BTC"}
+# Bit-vector encoding of the allowlists: every allowlisted address gets
+# one global bit (shared addresses like cbBTC reuse theirs), each chain's
+# allowlist collapses to a single int mask, and the per-vault exposure
+# check becomes one AND instead of a Python set comparison.
+ADDR_BIT: dict[str, int] = {}
+for _addresses in ALLOWLIST.values():
+    for _addr in _addresses:
+        ADDR_BIT.setdefault(_addr, 1 << len(ADDR_BIT))
+
+ALLOW_MASK: dict[int, int] = {
+    cid: sum(ADDR_BIT[addr] for addr in set(addresses))
+    for cid, addresses in ALLOWLIST.items()
+}
+
+
+def exposure_mask(exposures: frozenset[str]) -> int | None:
+    """Encode an exposure set as a bitmask; None if any address falls outside every allowlist."""
+    mask = 0
+    for addr in exposures:
+        bit = ADDR_BIT.get(addr)
+        if bit is None:
+            return None
+        mask |= bit
+    return mask
+
+DEPOSIT_ALLOW = frozenset({"USDC", "USDT", "ETH", "BTC"})
 
 chain = os.getenv("CHAIN", "all").lower()
 limit = int(os.getenv("LIMIT", "10"))
-first = int(os.getenv("FIRST", "500"))
+first = int(os.getenv("FIRST", "100"))
 skip = int(os.getenv("SKIP", "0"))
 positions_first = int(os.getenv("POSITIONS_FIRST", "50"))
 request_delay_ms = int(os.getenv("REQUEST_DELAY_MS", "100"))
+concurrency = int(os.getenv("CONCURRENCY", "16"))
+cache_ttl_s = int(os.getenv("CACHE_TTL_S", "300"))
+no_cache = os.getenv("NO_CACHE") == "1"
 
 chain_ids = CHAIN_MAP.get(chain)
 if not chain_ids:
@@ -119,29 +228,145 @@ if not chain_ids:
 
 limit = max(1, min(limit, 100))
 
+request_gate = asyncio.Semaphore(max(1, concurrency))
+
+RESPONSE_CACHE_DIR = os.path.expanduser("~/.cache/morpho")
 
-def gql(query, variables):
-    payload = json.dumps({"query": query, "variables": variables}).encode("utf-8")
-    req = urllib.request.Request(GRAPHQL, data=payload, headers={"content-type": "application/json"})
+
+def _cache_key(query: str, variables: dict[str, Any]) -> str:
+    raw = query + json.dumps(variables, sort_keys=True)
+    return hashlib.blake2b(raw.encode("utf-8")).hexdigest()
+
+
+def _cache_get(key: str) -> dict[str, Any] | None:
+    if no_cache:
+        return None
+    path = os.path.join(RESPONSE_CACHE_DIR, key + _CACHE_EXT)
+    try:
+        if time.time() - os.path.getmtime(path) > cache_ttl_s:
+            return None
+        with open(path, "rb") as f:
+            return _loads(_decompress(f.read()))
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_put(key: str, data: dict[str, Any]) -> None:
+    if no_cache:
+        return
+    try:
+        os.makedirs(RESPONSE_CACHE_DIR, exist_ok=True)
+        path = os.path.join(RESPONSE_CACHE_DIR, key + _CACHE_EXT)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_compress(_dumps(data)))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+async def gql(session: httpx.AsyncClient, query: str, variables: dict[str, Any]) -> dict[str, Any]:
+    key = _cache_key(query, variables)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    data = await _gql_fetch(session, query, variables)
+    _cache_put(key, data)
+    return data
+
+
+async def _gql_fetch(session: httpx.AsyncClient, query: str, variables: dict[str, Any]) -> dict[str, Any]:
     for attempt in range(2):
         try:
             if request_delay_ms > 0:
-                time.sleep(request_delay_ms / 1000)
-            with urllib.request.urlopen(req, timeout=30) as resp:
-                data = json.load(resp)
-            if "errors" in data:
-                raise RuntimeError(data["errors"])
-            return data["data"]
-        except urllib.error.HTTPError as e:
-            if e.code in (500, 502, 503, 504) and attempt == 0:
-                time.sleep(1.5 + (attempt * 0.5))
+                await asyncio.sleep(request_delay_ms / 1000)
+            async with request_gate:
+                resp = await session.post(GRAPHQL, content=_encode_operation(query, variables))
+                resp.raise_for_status()
+                data = _loads(resp.content)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (500, 502, 503, 504) and attempt == 0:
+                await asyncio.sleep(1.5 + (attempt * 0.5))
                 continue
             raise
-        except urllib.error.URLError:
+        except httpx.TransportError:
             if attempt == 0:
-                time.sleep(1.5 + (attempt * 0.5))
+                await asyncio.sleep(1.5 + (attempt * 0.5))
                 continue
             raise
+        if "errors" in data:
+            raise RuntimeError(data["errors"])
+        return data["data"]
+
+
+batch_supported: bool = True
+
+
+async def gql_batch(session: httpx.AsyncClient, operations: list[tuple[str, dict[str, Any]]]) -> list[dict[str, Any] | None]:
+    """POST several GraphQL operations as one JSON-list request.
+
+    Returns data payloads aligned with `operations`; a failed operation
+    yields None. Responses are served from / written to the disk cache
+    per operation, so only cache misses hit the network.
+    """
+    keys = [_cache_key(q, v) for q, v in operations]
+    results = [_cache_get(k) for k in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+    if not missing:
+        return results
+    fetched = await _gql_batch_fetch(session, [operations[i] for i in missing])
+    for i, data in zip(missing, fetched):
+        results[i] = data
+        if data is not None:
+            _cache_put(keys[i], data)
+    return results
+
+
+async def _gql_batch_fetch(session: httpx.AsyncClient, operations: list[tuple[str, dict[str, Any]]]) -> list[dict[str, Any] | None]:
+    """Network half of gql_batch; falls back to per-request queries if
+    the endpoint rejects list batching."""
+    global batch_supported
+    if batch_supported and len(operations) > 1:
+        payload = b"[" + b",".join(_encode_operation(q, v) for q, v in operations) + b"]"
+        for attempt in range(2):
+            try:
+                if request_delay_ms > 0:
+                    await asyncio.sleep(request_delay_ms / 1000)
+                async with request_gate:
+                    resp = await session.post(GRAPHQL, content=payload)
+                    resp.raise_for_status()
+                    data = _loads(resp.content)
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code in (500, 502, 503, 504) and attempt == 0:
+                    await asyncio.sleep(1.5 + (attempt * 0.5))
+                    continue
+                if e.response.status_code == 400:
+                    batch_supported = False
+                    print("Warning: GraphQL endpoint rejected list batching; falling back to per-request queries", file=sys.stderr)
+                break
+            except httpx.TransportError:
+                if attempt == 0:
+                    await asyncio.sleep(1.5 + (attempt * 0.5))
+                    continue
+                break
+            if isinstance(data, list) and len(data) == len(operations):
+                results = []
+                for item in data:
+                    if item.get("errors"):
+                        print(f"Warning: batched query failed: {item['errors']}", file=sys.stderr)
+                        results.append(None)
+                    else:
+                        results.append(item.get("data"))
+                return results
+            batch_supported = False
+            print("Warning: GraphQL endpoint returned a non-list response to a batched request; falling back to per-request queries", file=sys.stderr)
+            break
+    results = await asyncio.gather(*(_gql_fetch(session, q, v) for q, v in operations), return_exceptions=True)
+    for i, result in enumerate(results):
+        if isinstance(result, BaseException):
+            print(f"Warning: query failed: {result}", file=sys.stderr)
+            results[i] = None
+    return results
 
 
 def canonical_deposit(symbol: str) -> str:
@@ -152,18 +377,19 @@ def canonical_deposit(symbol: str) -> str:
     return symbol
 
 
-def fetch_vaults(chain_id: int):
+async def fetch_vaults(session: httpx.AsyncClient, ids: tuple[int, ...]) -> list[dict[str, Any]]:
+    """Fetch vaults for all requested chains in one paginated series."""
     items = []
     page = 0
     page_size = first
     while True:
         offset = skip + page * page_size
         try:
-            data = gql(VAULTS_QUERY, {"chainIds": [chain_id], "first": page_size, "skip": offset})
-        except urllib.error.HTTPError as e:
-            if e.code in (500, 502, 503, 504) and page_size > 50:
+            data = await gql(session, VAULTS_QUERY, {"chainIds": list(ids), "first": page_size, "skip": offset})
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code in (500, 502, 503, 504) and page_size > 50:
                 new_size = max(50, page_size // 2)
-                print(f"Warning: vault list query failed on chain {chain_id} with page size {page_size}; retrying with {new_size}", file=sys.stderr)
+                print(f"Warning: vault list query failed for chains {list(ids)} with page size {page_size}; retrying with {new_size}", file=sys.stderr)
                 page_size = new_size
                 items = []
                 page = 0
@@ -177,40 +403,115 @@ def fetch_vaults(chain_id: int):
     return items
 
 
-exposure_cache = {}
+exposure_cache: dict[ExposureKey, ExposureResult] = {}
+exposure_cache_ts: dict[ExposureKey, float] = {}
+
+EXPOSURE_BATCH_SIZE = 25
+EXPOSURE_CACHE_PATH = os.path.expanduser("~/.cache/morpho_exposures.json")
+EXPOSURE_CACHE_TTL_S = 24 * 3600
+
 
+def load_exposure_cache() -> None:
+    """Seed exposure_cache from disk, skipping expired entries."""
+    try:
+        with open(EXPOSURE_CACHE_PATH, "rb") as f:
+            raw = _loads(f.read())
+    except (OSError, ValueError):
+        return
+    now = time.time()
+    for key_str, entry in raw.items():
+        try:
+            chain_str, _, addr = key_str.partition(":")
+            if now - entry["ts"] > EXPOSURE_CACHE_TTL_S:
+                continue
+            key = (int(chain_str), addr)
+            exposure_cache[key] = (frozenset(entry["exposures"]), False)
+            exposure_cache_ts[key] = entry["ts"]
+        except (KeyError, TypeError, ValueError):
+            continue
 
-def resolve_exposures(vault_address: str, chain_id: int, seen=None, positions_limit=None):
-    key = (chain_id, vault_address.lower())
-    if key in exposure_cache:
-        return exposure_cache[key]
-    if seen is None:
-        seen = set()
-    if key in seen:
-        exposure_cache[key] = (set(), True)
-        return exposure_cache[key]
-    seen.add(key)
 
-    if positions_limit is None:
-        positions_limit = positions_first
+def save_exposure_cache() -> None:
+    """Persist resolved exposures to disk (atomic replace).
 
+    Unknown results are not persisted: they may come from transient
+    query failures and should be re-resolved on the next run.
+    """
+    entries = {}
+    now = time.time()
+    for (chain_id, addr), (exposures, unknown) in exposure_cache.items():
+        if unknown:
+            continue
+        entries[f"{chain_id}:{addr}"] = {
+            "exposures": sorted(exposures),
+            "ts": exposure_cache_ts.get((chain_id, addr), now),
+        }
     try:
-        data = gql(EXPOSURE_QUERY, {"address": vault_address, "chainId": chain_id, "positionsFirst": positions_limit})
-    except Exception as exc:
-        if positions_limit > 25:
-            fallback = max(25, positions_limit // 2)
-            print(f"Warning: exposure query failed for {vault_address} on {chain_id}: {exc}; retrying with positionsFirst={fallback}", file=sys.stderr)
-            return resolve_exposures(vault_address, chain_id, seen=seen, positions_limit=fallback)
-        print(f"Warning: exposure query failed for {vault_address} on {chain_id}: {exc}", file=sys.stderr)
-        exposure_cache[key] = (set(), True)
-        return exposure_cache[key]
+        os.makedirs(os.path.dirname(EXPOSURE_CACHE_PATH), exist_ok=True)
+        tmp = EXPOSURE_CACHE_PATH + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_dumps(entries))
+        os.replace(tmp, EXPOSURE_CACHE_PATH)
+    except OSError:
+        pass
+
+
+_SIZE_ERROR_HINTS = ("too large", "timeout", "timed out")
+_exposure_warned: set[tuple[str, int]] = set()
+
+
+def _warn_once(marker: tuple[str, int], message: str) -> None:
+    """Warn once per unique marker; stderr writes are syscalls and add up under concurrency."""
+    if marker in _exposure_warned:
+        return
+    _exposure_warned.add(marker)
+    print(message, file=sys.stderr)
+
+
+def _is_size_error(exc: BaseException) -> bool:
+    """True when the failure plausibly stems from an oversized positions page."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in (413, 504)
+    if isinstance(exc, httpx.TimeoutException):
+        return True
+    message = str(exc).lower()
+    return any(hint in message for hint in _SIZE_ERROR_HINTS)
+
+
+async def _fetch_exposure_single(session: httpx.AsyncClient, vault_address: str, chain_id: int) -> tuple[dict[str, Any] | None, int]:
+    """Fetch one vault's adapters, stepping positionsFirst down a fixed ladder.
+
+    Smaller pages are only retried when the error suggests the page size
+    was the problem (413/504/timeout); unrelated failures give up
+    immediately instead of re-issuing full round-trips. Returns
+    (data, positions_limit_used); data is None on failure.
+    """
+    ladder = sorted({n for n in (positions_first, 25, 10) if n <= positions_first}, reverse=True)
+    for i, positions_limit in enumerate(ladder):
+        try:
+            data = await gql(session, EXPOSURE_QUERY, {"address": vault_address, "chainId": chain_id, "positionsFirst": positions_limit})
+            return data, positions_limit
+        except Exception as exc:
+            if i + 1 < len(ladder) and _is_size_error(exc):
+                _warn_once((vault_address, positions_limit),
+                           f"Warning: exposure query failed for {vault_address} on {chain_id}: {exc}; retrying with positionsFirst={ladder[i + 1]}")
+                continue
+            _warn_once((vault_address, positions_limit),
+                       f"Warning: exposure query failed for {vault_address} on {chain_id}: {exc}")
+            return None, positions_limit
+    return None, ladder[-1]
+
+
+def _parse_adapters(key: ExposureKey, data: dict[str, Any] | None, positions_limit: int) -> dict[str, Any]:
+    """Extract direct exposures and MetaMorpho children from one vault's adapter list."""
+    node: dict[str, Any] = {"exposures": set(), "unknown": False, "children": []}
+    if data is None:
+        node["unknown"] = True
+        return node
 
     vault = data.get("vaultV2ByAddress") or {}
     adapters = (vault.get("adapters") or {}).get("items") or []
 
-    exposures = set()
-    unknown = False
-
     for adapter in adapters:
         typename = adapter.get("__typename")
         if typename == "MetaMorphoAdapter":
@@ -218,104 +519,226 @@ def resolve_exposures(vault_address: str, chain_id: int, seen=None, positions_li
             meta_addr = (meta.get("address") or "").lower()
             asset_addr = ((meta.get("asset") or {}).get("address") or "").lower()
             if meta_addr:
-                nested, nested_unknown = resolve_exposures(meta_addr, chain_id, seen)
-                if not nested_unknown:
-                    exposures.update(nested)
-                    continue
-            if asset_addr:
-                exposures.add(asset_addr)
-                print(f"Warning: MetaMorpho fallback to asset address for {meta_addr or vault_address}", file=sys.stderr)
-                continue
-            unknown = True
+                node["children"].append(((key[0], meta_addr), asset_addr))
+            elif asset_addr:
+                node["exposures"].add(asset_addr)
+                print(f"Warning: MetaMorpho fallback to asset address for {key[1]}", file=sys.stderr)
+            else:
+                node["unknown"] = True
         elif typename == "MorphoMarketV1Adapter":
             positions = (adapter.get("positions") or {}).get("items") or []
             if len(positions) >= positions_limit:
-                unknown = True
+                node["unknown"] = True
                 continue
             for pos in positions:
                 market = (pos or {}).get("market") or {}
-                for key in ("loanAsset", "collateralAsset"):
-                    addr = ((market.get(key) or {}).get("address") or "").lower()
+                for side in ("loanAsset", "collateralAsset"):
+                    addr = ((market.get(side) or {}).get("address") or "").lower()
                     if not addr:
-                        unknown = True
+                        node["unknown"] = True
                         continue
-                    exposures.add(addr)
+                    node["exposures"].add(addr)
         else:
-            unknown = True
+            node["unknown"] = True
 
-    if not exposures:
-        unknown = True
+    return node
 
-    exposure_cache[key] = (exposures, unknown)
-    return exposure_cache[key]
 
+def _finalize_exposures(nodes: dict[ExposureKey, dict[str, Any]]) -> None:
+    """Propagate BFS node results back through the adapter graph into exposure_cache.
 
-results = []
-for cid in chain_ids:
-    allow = ALLOWLIST.get(cid, {})
-    for v in fetch_vaults(cid):
-        if not v.get("whitelisted"):
-            continue
-        if v.get("warnings"):
+    Runs an explicit post-order walk (no recursion, so arbitrarily deep
+    MetaMorpho chains cannot exhaust the interpreter stack). A node is
+    pushed once to expand its children and once more to combine their
+    finalized results. `on_stack` holds the chain of expanded-but-
+    unfinished ancestors: a child found there is a cycle and contributes
+    nothing rather than "unknown", so the cycle short-circuits without
+    poisoning the cache for vaults that are otherwise fully resolvable.
+    """
+    for root in nodes:
+        if root in exposure_cache:
             continue
+        on_stack = set()
+        stack = [(root, False)]
+        while stack:
+            key, expanded = stack.pop()
+            if not expanded:
+                if key in exposure_cache or key in on_stack:
+                    continue
+                on_stack.add(key)
+                stack.append((key, True))
+                for child_key, _ in nodes[key]["children"]:
+                    if child_key not in exposure_cache and child_key not in on_stack:
+                        stack.append((child_key, False))
+                continue
+            on_stack.discard(key)
+            node = nodes[key]
+            exposures = set(node["exposures"])
+            unknown = node["unknown"]
+            for child_key, fallback_addr in node["children"]:
+                nested = exposure_cache.get(child_key)
+                if nested is None:
+                    # Child is an unfinished ancestor: cycle, skip.
+                    continue
+                nested_exposures, nested_unknown = nested
+                if not nested_unknown:
+                    exposures.update(nested_exposures)
+                elif fallback_addr:
+                    exposures.add(fallback_addr)
+                    print(f"Warning: MetaMorpho fallback to asset address for {child_key[1]}", file=sys.stderr)
+                else:
+                    unknown = True
+            if not exposures:
+                unknown = True
+            exposure_cache[key] = (frozenset(exposures), unknown)
+
+
+async def resolve_exposures(session: httpx.AsyncClient, frontier: list[tuple[str, int]]) -> None:
+    """Resolve exposure sets for (address, chain_id) roots into exposure_cache.
+
+    Walks MetaMorpho nesting breadth-first: every level of the adapter
+    graph is deduplicated and fetched with batched GraphQL requests, so
+    latency scales with nesting depth rather than vault count.
+    """
+    nodes: dict[ExposureKey, dict[str, Any]] = {}
+    seen: set[ExposureKey] = set()
+    level: list[ExposureKey] = []
+    for vault_address, chain_id in frontier:
+        key = (chain_id, vault_address.lower())
+        if key not in exposure_cache and key not in seen:
+            seen.add(key)
+            level.append(key)
+
+    while level:
+        datas = []
+        for start in range(0, len(level), EXPOSURE_BATCH_SIZE):
+            chunk = level[start:start + EXPOSURE_BATCH_SIZE]
+            operations = [
+                (EXPOSURE_QUERY, {"address": addr, "chainId": cid, "positionsFirst": positions_first})
+                for cid, addr in chunk
+            ]
+            datas.extend(await gql_batch(session, operations))
+
+        limits = [positions_first] * len(level)
+        failed = [i for i, data in enumerate(datas) if data is None]
+        if failed:
+            retried = await asyncio.gather(*(_fetch_exposure_single(session, level[i][1], level[i][0]) for i in failed))
+            for i, (data, used_limit) in zip(failed, retried):
+                datas[i] = data
+                limits[i] = used_limit
+
+        next_level = []
+        for key, data, used_limit in zip(level, datas, limits):
+            node = _parse_adapters(key, data, used_limit)
+            nodes[key] = node
+            for child_key, _ in node["children"]:
+                if child_key in exposure_cache or child_key in seen:
+                    continue
+                seen.add(child_key)
+                next_level.append(child_key)
+        level = next_level
+
+    _finalize_exposures(nodes)
+
+
+async def main() -> None:
+    # Bounded min-heap holding only the current top-`limit` vaults;
+    # the counter is a tiebreaker so records never get compared.
+    top: list[tuple[float, float, int, dict[str, Any]]] = []
+    seq = 0
+    load_exposure_cache()
+    limits = httpx.Limits(max_connections=max(1, concurrency), max_keepalive_connections=max(1, concurrency))
+    async with httpx.AsyncClient(
+        http2=h2 is not None,
+        limits=limits,
+        timeout=30,
+        headers={"content-type": "application/json", "accept-encoding": ACCEPT_ENCODING},
+    ) as session:
+        vaults = await fetch_vaults(session, chain_ids)
+        candidates = []
+        for v in vaults:
+            cid = (v.get("chain") or {}).get("id")
+            allow = ALLOWLIST.get(cid)
+            if not allow:
+                continue
+            if not v.get("whitelisted"):
+                continue
+            if v.get("warnings"):
+                continue
 
-        asset = v.get("asset") or {}
-        deposit_addr = (asset.get("address") or "").lower()
-        deposit_symbol = allow.get(deposit_addr)
-        if not deposit_symbol:
-            continue
-        deposit_canon = canonical_deposit(deposit_symbol)
-        if deposit_canon not in DEPOSIT_ALLOW:
-            continue
+            asset = v.get("asset") or {}
+            deposit_addr = (asset.get("address") or "").lower()
+            deposit_symbol = allow.get(deposit_addr)
+            if not deposit_symbol:
+                continue
+            deposit_canon = canonical_deposit(deposit_symbol)
+            if deposit_canon not in DEPOSIT_ALLOW:
+                continue
 
-        liquidity = v.get("totalAssetsUsd")
-        if liquidity is None and deposit_canon in ("USDC", "USDT"):
-            total_assets = v.get("totalAssets")
-            decimals = asset.get("decimals") or 0
-            if total_assets is not None:
-                liquidity = total_assets / (10 ** decimals)
-        if liquidity is None or liquidity < 10_000_000:
-            continue
+            liquidity = v.get("totalAssetsUsd")
+            if liquidity is None and deposit_canon in ("USDC", "USDT"):
+                total_assets = v.get("totalAssets")
+                decimals = asset.get("decimals") or 0
+                if total_assets is not None:
+                    liquidity = total_assets / (10 ** decimals)
+            if liquidity is None or liquidity < 10_000_000:
+                continue
 
-        net_apy = v.get("netApy")
-        if net_apy is None or net_apy <= 0:
-            continue
+            net_apy = v.get("netApy")
+            if net_apy is None or net_apy <= 0:
+                continue
 
-        exposures, unknown = resolve_exposures(v.get("address"), cid)
-        if unknown:
-            continue
-        if not exposures.issubset(set(allow.keys())):
-            continue
+            candidates.append((v, cid, deposit_canon, liquidity, net_apy))
 
-        exposure_symbols = sorted({allow[a] for a in exposures if a in allow})
-        results.append({
-            "name": v.get("name") or v.get("symbol") or v.get("address"),
-            "symbol": v.get("symbol"),
-            "chain": (v.get("chain") or {}).get("network"),
-            "deposit": deposit_canon,
-            "exposures": exposure_symbols,
-            "net_apy_pct": net_apy * 100,
-            "liquidity": liquidity,
-            "address": v.get("address"),
-        })
-
-results.sort(key=lambda r: (-r["net_apy_pct"], -r["liquidity"]))
-results = results[:limit]
-
-print("# Morpho Protocol Leaderboard (Conservative)")
-print("")
-print("> Top Vaults by Net APY")
-print(f"> Chains: {chain.title()} | Updated: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}")
-print("> Filters: Liquidity >$10M USD | whitelisted only | no warnings")
-print("\n---\n")
-print("## Top Vaults\n")
-print("| Rank | Vault | Deposit Asset | Chain | Net APY | Liquidity | Exposure | Link |")
-print("|------|-------|---------------|-------|---------|-----------|----------|------|")
-if not results:
-    print("| - | No vaults matched filters | - | - | - | - | - | - |")
-else:
-    for i, r in enumerate(results, 1):
-        chain_slug = (r["chain"] or "").lower()
-        link = f"https://app.morpho.org/{chain_slug}/vault/{r['address']}"
-        exposure_str = ", ".join(r["exposures"]) if r["exposures"] else "-"
-        print(f"| {i} | {r['name']} | {r['deposit']} | {r['chain']} | {r['net_apy_pct']:.2f}% | ${r['liquidity']/1e6:.1f}M | {exposure_str} | {link} |")
+        await resolve_exposures(session, [(v.get("address"), cid) for v, cid, _, _, _ in candidates])
+        for v, cid, deposit_canon, liquidity, net_apy in candidates:
+            exposures, unknown = exposure_cache[(cid, (v.get("address") or "").lower())]
+            if unknown:
+                continue
+            mask = exposure_mask(exposures)
+            if mask is None or mask & ~ALLOW_MASK.get(cid, 0):
+                continue
+
+            allow = ALLOWLIST[cid]
+            exposure_symbols = sorted({allow[a] for a in exposures if a in allow})
+            record = {
+                "name": v.get("name") or v.get("symbol") or v.get("address"),
+                "symbol": v.get("symbol"),
+                "chain": NETWORK_BY_ID.get(cid),
+                "deposit": deposit_canon,
+                "exposures": exposure_symbols,
+                "net_apy_pct": net_apy * 100,
+                "liquidity": liquidity,
+                "address": v.get("address"),
+            }
+            heapq.heappush(top, (record["net_apy_pct"], record["liquidity"], seq, record))
+            seq += 1
+            if len(top) > limit:
+                heapq.heappop(top)
+
+    save_exposure_cache()
+
+    results = [entry[3] for entry in sorted(top, key=lambda t: (-t[0], -t[1]))]
+
+    print("# Morpho Protocol Leaderboard (Conservative)")
+    print("")
+    print("> Top Vaults by Net APY")
+    print(f"> Chains: {chain.title()} | Updated: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M UTC')}")
+    print("> Filters: Liquidity >$10M USD | whitelisted only | no warnings")
+    print("\n---\n")
+    print("## Top Vaults\n")
+    print("| Rank | Vault | Deposit Asset | Chain | Net APY | Liquidity | Exposure | Link |")
+    print("|------|-------|---------------|-------|---------|-----------|----------|------|")
+    if not results:
+        print("| - | No vaults matched filters | - | - | - | - | - | - |")
+    else:
+        for i, r in enumerate(results, 1):
+            chain_slug = (r["chain"] or "").lower()
+            link = f"https://app.morpho.org/{chain_slug}/vault/{r['address']}"
+            exposure_str = ", ".join(r["exposures"]) if r["exposures"] else "-"
+            print(f"| {i} | {r['name']} | {r['deposit']} | {r['chain']} | {r['net_apy_pct']:.2f}% | ${r['liquidity']/1e6:.1f}M | {exposure_str} | {link} |")
+
+
+if uvloop is not None:
+    uvloop.install()
+asyncio.run(main())
@@ -12,21 +12,110 @@ Environment:
 
 import os
 import sys
+import gzip
 import json
+import time
 import base64
+import asyncio
+import hashlib
 import argparse
-import requests
+from collections import defaultdict
+from heapq import nlargest
+from operator import itemgetter
+import aiohttp
 
+# Use orjson's C-accelerated parser when available; stdlib json otherwise.
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
-def get_portfolio(address, api_key, currency="usd", only_defi=False, non_trash=True):
+# aiohttp decompresses transparently; advertise brotli only when its
+# decoder is importable so the server never sends an encoding we cannot
+# decode.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPT_ENCODING = 'br, gzip, deflate' if brotli is not None else 'gzip, deflate'
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Short-TTL disk cache so repeated runs (e.g. while iterating on a
+# report) don't refetch every pagination cursor. NO_CACHE=1 bypasses.
+CACHE_DIR = os.path.expanduser('~/.cache/zerion')
+CACHE_TTL_S = int(os.getenv('CACHE_TTL_S', '300'))
+NO_CACHE = os.getenv('NO_CACHE') == '1'
+
+
+def _cache_path(url, params):
+    raw = url + json.dumps(params or {}, sort_keys=True)
+    return os.path.join(CACHE_DIR, hashlib.blake2b(raw.encode()).hexdigest() + '.json.gz')
+
+
+def _cache_get(url, params):
+    if NO_CACHE:
+        return None
+    path = _cache_path(url, params)
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL_S:
+            return None
+        with open(path, 'rb') as f:
+            return _loads(gzip.decompress(f.read()))
+    except (OSError, ValueError):
+        return None
+
+
+def _cache_put(url, params, data):
+    if NO_CACHE:
+        return
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _cache_path(url, params)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(gzip.compress(json.dumps(data).encode()))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+async def _get_json(session, url, headers, params=None):
+    """GET a JSON payload, retrying transient 5xx/connection errors with backoff."""
+    cached = _cache_get(url, params)
+    if cached is not None:
+        return cached
+    for attempt in range(4):
+        try:
+            async with session.get(url, headers=headers, params=params) as response:
+                if response.status in RETRY_STATUSES and attempt < 3:
+                    await asyncio.sleep(1.5 * (attempt + 1))
+                    continue
+                response.raise_for_status()
+                data = _loads(await response.read())
+                _cache_put(url, params, data)
+                return data
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if attempt < 3:
+                await asyncio.sleep(1.5 * (attempt + 1))
+                continue
+            raise
+
+
+async def get_portfolio(session, address, api_key, currency="usd", only_defi=False, non_trash=True):
     """
     Get wallet portfolio positions.
-    
+
     Official endpoint: GET /v1/wallets/{address}/positions/
     Returns raw API response.
-    
+
     By default, returns both wallet assets AND DeFi protocol positions.
     Use only_defi=True to get only DeFi protocol positions.
+
+    Zerion's positions endpoint only exposes a `next` cursor, so pages
+    are fetched sequentially over the shared keep-alive session.
     """
     # Transform API key for Basic Auth (official method)
     api_key_transformed = base64.b64encode(f'{api_key}:'.encode()).decode()
@@ -50,22 +139,44 @@ def get_portfolio(address, api_key, currency="usd", only_defi=False, non_trash=T
         params['filter[positions]'] = 'only_complex'
     
     all_data = []
-    
+
     # Handle pagination
     while url:
-        response = requests.get(url, headers=headers, params=params, timeout=30)
-        response.raise_for_status()
-        data = response.json()
-        
+        data = await _get_json(session, url, headers, params)
+
         all_data.extend(data.get('data', []))
-        
+
         # Get next page URL
         url = data.get('links', {}).get('next')
         params = None  # Params are in the next URL
-    
+
     return all_data
 
 
+async def fetch_positions(address, api_key, currency="usd", only_defi=False):
+    """Fetch the requested position sets over one pooled HTTP session."""
+    timeout = aiohttp.ClientTimeout(total=30)
+    connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=60)
+    async with aiohttp.ClientSession(
+        timeout=timeout,
+        connector=connector,
+        headers={'accept-encoding': ACCEPT_ENCODING}
+    ) as session:
+        if only_defi:
+            # Only get DeFi protocol positions
+            return await get_portfolio(session, address, api_key, currency=currency, only_defi=True)
+
+        # Get both wallet assets AND DeFi positions; the two request
+        # chains are independent, so run them concurrently
+        wallet_data, defi_data = await asyncio.gather(
+            get_portfolio(session, address, api_key, currency=currency, only_defi=False),
+            get_portfolio(session, address, api_key, currency=currency, only_defi=True),
+        )
+
+        # Combine both datasets
+        return wallet_data + defi_data
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Fetch wallet portfolio from Zerion API',
@@ -87,47 +198,27 @@ def main():
         # Fetch wallet and DeFi positions
         # Note: Zerion API separates wallet assets from DeFi protocol positions
         # We need to fetch both to get complete picture
-        
-        if args.only_defi:
-            # Only get DeFi protocol positions
-            data = get_portfolio(
-                args.address, 
-                api_key, 
-                currency=args.currency,
-                only_defi=True
-            )
-        else:
-            # Get both wallet assets AND DeFi positions
-            wallet_data = get_portfolio(
-                args.address, 
-                api_key, 
-                currency=args.currency,
-                only_defi=False
-            )
-            
-            defi_data = get_portfolio(
-                args.address, 
-                api_key, 
-                currency=args.currency,
-                only_defi=True
-            )
-            
-            # Combine both datasets
-            data = wallet_data + defi_data
-        
+        data = asyncio.run(fetch_positions(
+            args.address,
+            api_key,
+            currency=args.currency,
+            only_defi=args.only_defi
+        ))
+
         # Process and summarize the data
-        wallet_total = 0
-        protocol_totals = {}
-        token_values = {}
-        
+        wallet_total = 0.0
+        protocol_totals = defaultdict(float)
+        token_values = defaultdict(float)
+
         for item in data:
             attrs = item.get('attributes', {})
             value = attrs.get('value')
-            
+
             # Skip assets without value
             if value is None or value == 0:
                 continue
-            
+            value = float(value)
+
             position_type = attrs.get('position_type', 'wallet')
             protocol = attrs.get('protocol')
             fungible = attrs.get('fungible_info', {})
@@ -138,13 +229,13 @@ def main():
             if position_type != 'wallet' and protocol is not None:
                 # This is a DeFi protocol position
                 protocol_name = protocol if isinstance(protocol, str) else 'Unknown Protocol'
-                protocol_totals[protocol_name] = protocol_totals.get(protocol_name, 0) + value
+                protocol_totals[protocol_name] += value
             else:
                 # This is a wallet asset (includes LP tokens, aTokens, etc. in wallet)
                 wallet_total += value
-            
+
             # Aggregate by token symbol for top holdings
-            token_values[symbol] = token_values.get(symbol, 0) + value
+            token_values[symbol] += value
         
         # Calculate total portfolio value
         total_value = wallet_total + sum(protocol_totals.values())
@@ -160,7 +251,7 @@ def main():
         print(f"  Wallet Assets: ${wallet_total:,.2f} USD ({wallet_total/total_value*100:.1f}%)" if total_value > 0 else "  Wallet Assets: $0.00 USD")
         
         if protocol_totals:
-            for protocol, value in sorted(protocol_totals.items(), key=lambda x: x[1], reverse=True):
+            for protocol, value in sorted(protocol_totals.items(), key=itemgetter(1), reverse=True):
                 pct = (value / total_value * 100) if total_value > 0 else 0
                 print(f"  {protocol}: ${value:,.2f} USD ({pct:.1f}%)")
         
@@ -170,10 +261,12 @@ def main():
         # 2. Top 20 Tokens (>$1)
         print("🏆 Top Holdings (>$1 USD):")
         
-        # Filter tokens > $1 and sort by value
-        top_tokens = [(symbol, value) for symbol, value in token_values.items() if value > 1]
-        top_tokens.sort(key=lambda x: x[1], reverse=True)
-        top_tokens = top_tokens[:20]
+        # Filter tokens > $1 and keep the 20 largest (O(N log 20) vs full sort)
+        top_tokens = nlargest(
+            20,
+            ((symbol, value) for symbol, value in token_values.items() if value > 1),
+            key=itemgetter(1)
+        )
         
         if top_tokens:
             for symbol, value in top_tokens:
@@ -185,9 +278,9 @@ def main():
         print()
         print("=" * 60)
             
-    except requests.exceptions.HTTPError as e:
+    except aiohttp.ClientResponseError as e:
         print(f'HTTP Error: {e}', file=sys.stderr)
-        if e.response.status_code == 401:
+        if e.status == 401:
             print('Invalid API key. Check your ZERION_API_KEY.', file=sys.stderr)
         return 1
     except Exception as e: